@@ -1,9 +1,15 @@
 import sys
 import os
-import time
+import re
 import json
+import logging
 
-from PyQt5.QtCore import Qt, QRect, QTimer
+try:
+    import orjson
+except ImportError:  # optional; the stdlib json module is the fallback
+    orjson = None
+
+from PyQt5.QtCore import Qt, QEvent, QRect, QTimer, QRunnable, QThreadPool, QBuffer, QIODevice
 from PyQt5.QtGui import (
     QPainter,
     QPen,
@@ -12,6 +18,8 @@ from PyQt5.QtGui import (
     QKeySequence,
     QPixmap,
     QColor,
+    QImage,
+    QImageWriter,
 )
 from PyQt5.QtWidgets import (
     QApplication,
@@ -27,82 +35,204 @@ from PyQt5.QtWidgets import (
 )
 
 CONFIG_FILE = "config.txt"
+# Sequence-numbered shots; a distinct prefix keeps the old
+# screenshot_<unix time>.png files out of the numbering
+SHOT_NAME = re.compile(r"shot_(\d{6,})\.png")
+
+logger = logging.getLogger("cst")
+
+def last_shot_number(folder):
+    """Return the highest existing shot number in folder, or 0."""
+    last = 0
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                m = SHOT_NAME.fullmatch(entry.name)
+                if m:
+                    last = max(last, int(m.group(1)))
+    except OSError:
+        pass
+    return last
+
+class SaveTask(QRunnable):
+    """Encodes and writes one screenshot on a pool thread."""
+
+    # Qt's PNG writer maps quality q to zlib level (100 - q) * 9 // 91, so
+    # 85 is level 1: far cheaper DEFLATE than the default, still lossless.
+    PNG_QUALITY = 85
+
+    def __init__(self, image, path):
+        super().__init__()
+        self.image = image
+        self.path = path
+
+    def run(self):
+        # Encode into memory, then hand the file the whole PNG in one write
+        # instead of the encoder's many small chunked writes
+        buf = QBuffer()
+        buf.open(QIODevice.WriteOnly)
+        writer = QImageWriter(buf, b"PNG")
+        writer.setQuality(self.PNG_QUALITY)
+        if not writer.write(self.image):
+            logger.warning("Failed to encode screenshot %s: %s", self.path, writer.errorString())
+            return
+        try:
+            with open(self.path, "wb") as f:
+                f.write(buf.data().data())
+        except OSError as e:
+            logger.warning("Failed to save screenshot %s: %s", self.path, e)
+            return
+        logger.debug("Screenshot saved: %s", self.path)
 
 class Overlay(QWidget):
-    def __init__(self, width, height, save_folder, on_closed):
+    def __init__(self, width, height, save_folder, counter, on_closed):
         super().__init__(
             None,
             Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint
         )
         self.w, self.h = width, height
+        # Cursor-to-corner offsets for the drawn frame and the captured region
+        self._dx, self._dy = self.w // 2 - 1, self.h // 2 - 1
+        self._capture_dx, self._capture_dy = self.w // 2, self.h // 2
         self.save_folder = save_folder
+        # Folder is fixed for the overlay's lifetime; join it once
+        self._save_prefix = os.path.join(save_folder, "")
         self.on_closed = on_closed
+        # PNG encode + disk write run here so clicks never block the GUI
+        self._pool = QThreadPool.globalInstance()
+        # Last shot number used; owned by MainWindow and handed back on close
+        self._counter = counter
+        # Resolved once instead of on every click
+        self._screen = QGuiApplication.primaryScreen()
+
+        logger.debug("Overlay init: size=(%d×%d), folder='%s'", self.w, self.h, self.save_folder)
 
-        print(f"[DEBUG] Overlay init: size=({self.w}×{self.h}), folder='{self.save_folder}'")
+        # Near-transparent background, rendered once per size in resizeEvent
+        self._bg = QPixmap()
 
         # Full-screen translucent overlay (per-pixel)
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setMouseTracking(True)
         self.showFullScreen()
-        print("[DEBUG] Overlay shown full-screen")
+        logger.debug("Overlay shown full-screen")
+
+        # The red capture rectangle never changes size, so stroke it once
+        self._frame = self._build_frame()
+        # No repaint heartbeat: input drives updates, and moving to a screen
+        # with another pixel ratio re-renders the frame and repaints once
+        self.windowHandle().screenChanged.connect(self._screen_changed)
 
         # Hide system cursor
-        blank = QPixmap(1, 1); blank.fill(Qt.transparent)
-        blank_cursor = QCursor(blank)
+        blank_cursor = QCursor(Qt.BlankCursor)
         QApplication.setOverrideCursor(blank_cursor)
         self.setCursor(blank_cursor)
-        print("[DEBUG] System cursor hidden")
+        logger.debug("System cursor hidden")
 
         # Grab mouse & keyboard once so the overlay never loses focus
         self.grabMouse()
         self.grabKeyboard()
-        print("[DEBUG] Mouse and keyboard grabbed by overlay")
+        logger.debug("Mouse and keyboard grabbed by overlay")
+
+        # Ctrl+G and Esc arrive through the keyboard grab and are handled in
+        # keyPressEvent; MainWindow's shortcut can't fire while it is hidden
+
+        # Cursor position is queried once here, then tracked from mouse moves;
+        # repaint only when it moves, and only around the rectangle
+        self._cursor_local = self.mapFromGlobal(QCursor.pos())
+        self._pending_pos = self._cursor_local
+        self._move_pending = False
+
+    def _build_frame(self):
+        # 3px of padding on every side leaves room for the pen width
+        dpr = self.devicePixelRatioF()
+        frame = QPixmap(round((self.w + 6) * dpr), round((self.h + 6) * dpr))
+        frame.setDevicePixelRatio(dpr)
+        frame.fill(Qt.transparent)
+        p = QPainter(frame)
+        p.setPen(QPen(Qt.red, 3))
+        p.drawRect(QRect(3, 3, self.w, self.h))
+        p.end()
+        return frame
+
+    def _screen_changed(self, screen):
+        self._frame = self._build_frame()
+        self.update()
+
+    def _frame_rect(self, lp):
+        # capture rectangle centred on lp, inflated by the pen width
+        x = lp.x() - self._dx
+        y = lp.y() - self._dy
+        return QRect(x, y, self.w, self.h).adjusted(-3, -3, 3, 3)
 
-        # Shortcuts to close overlay
-        QShortcut(QKeySequence("Ctrl+G"), self, context=Qt.ApplicationShortcut).activated.connect(self.close)
-        QShortcut(QKeySequence("Escape"), self, context=Qt.ApplicationShortcut).activated.connect(self.close)
-        print("[DEBUG] Shortcuts for Ctrl+G and Esc set")
+    def resizeEvent(self, event):
+        self._bg = QPixmap(event.size())
+        self._bg.fill(QColor(0, 0, 0, 1))
+        super().resizeEvent(event)
 
-        # Timer for smooth repaint
-        self._timer = QTimer(self)
-        self._timer.timeout.connect(self.update)
-        self._timer.start(0)
-        print("[DEBUG] Repaint timer started")
+    def event(self, event):
+        # Mouse moves can arrive faster than we repaint: keep only the latest
+        # position and act on it once the event queue has drained
+        if event.type() == QEvent.MouseMove:
+            self._pending_pos = event.pos()
+            if not self._move_pending:
+                self._move_pending = True
+                QTimer.singleShot(0, self._process_pending_move)
+            return True
+        return super().event(event)
+
+    def _process_pending_move(self):
+        self._move_pending = False
+        # e.g. tablets report moves without a pixel change; nothing to redraw
+        if self._pending_pos == self._cursor_local:
+            return
+        old = self._frame_rect(self._cursor_local)
+        self._cursor_local = self._pending_pos
+        self.update(old.united(self._frame_rect(self._cursor_local)))
 
     def paintEvent(self, event):
         painter = QPainter(self)
-        # 1) dim everything underneath by drawing a semi-transparent black fill
-        painter.fillRect(self.rect(), QColor(0, 0, 0, 1))
-        # 2) draw the red capture rectangle
-        painter.setPen(QPen(Qt.red, 3))
-        gp = QCursor.pos()
-        lp = self.mapFromGlobal(gp)
-        x = lp.x() - self.w // 2 + 1
-        y = lp.y() - self.h // 2 + 1
-        painter.drawRect(QRect(x, y, self.w, self.h))
+        # only touch pixels Qt asked for; the rest of the backing store is kept
+        painter.setClipRegion(event.region())
+        dirty = event.region().boundingRect()
+        # 1) dim the dirty area by blitting the cached semi-transparent fill
+        painter.drawPixmap(dirty, self._bg, dirty)
+        # 2) blit the pre-stroked red capture rectangle
+        r = self._frame_rect(self._cursor_local)
+        if r.intersects(dirty):
+            painter.drawPixmap(r.topLeft(), self._frame)
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             gp = QCursor.pos()
-            x = gp.x() - self.w // 2
-            y = gp.y() - self.h // 2
-            print(f"[DEBUG] Click at global ({gp.x()},{gp.y()}), region=({x},{y},{self.w},{self.h})")
-            img = QGuiApplication.primaryScreen().grabWindow(0, x, y, self.w, self.h)
-            timestamp = int(time.time())
-            filename = f"screenshot_{timestamp}.png"
-            path = os.path.join(self.save_folder, filename)
-            img.save(path)
-            print(f"[DEBUG] Screenshot saved: {filename}")
+            x = gp.x() - self._capture_dx
+            y = gp.y() - self._capture_dy
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Click at global ({gp.x()},{gp.y()}), region=({x},{y},{self.w},{self.h})")
+            pix = self._screen.grabWindow(0, x, y, self.w, self.h)
+            self._counter += 1
+            filename = f"shot_{self._counter:06d}.png"
+            path = self._save_prefix + filename
+            # QPixmap is GUI-thread only; hand the worker a QImage
+            # (convertToFormat is a no-op when the grab is already RGB32)
+            img = pix.toImage().convertToFormat(QImage.Format_RGB32)
+            self._pool.start(SaveTask(img, path))
             event.accept()  # consume the click, keep overlay up
 
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape or (
+            event.key() == Qt.Key_G and event.modifiers() & Qt.ControlModifier
+        ):
+            self.close()
+        else:
+            super().keyPressEvent(event)
+
     def closeEvent(self, event):
-        print("[DEBUG] Closing overlay")
-        self._timer.stop()
+        logger.debug("Closing overlay")
         self.releaseMouse()
         self.releaseKeyboard()
         QApplication.restoreOverrideCursor()
-        print("[DEBUG] Restored cursor, released grabs, timer stopped")
-        self.on_closed()
+        logger.debug("Restored cursor, released grabs")
+        self.on_closed(self._counter)
         super().closeEvent(event)
 
 class MainWindow(QMainWindow):
@@ -111,16 +241,35 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Consistent Screenshot Tool")
         self.setFixedSize(450, 150)
 
+        # Capture size; plain ints that deliberately shadow QWidget.width()/height()
+        self.width = 300
+        self.height = 300
         self.save_folder = ""
+        # Checked once when the folder is loaded or picked, not on every toggle
+        self._save_folder_ok = False
+        # Scanned once per folder, not per overlay: shots still being written
+        # by the thread pool wouldn't show up in a rescan and get overwritten
+        self._shot_counter = 0
      
         self.overlay = None
-        print("[DEBUG] MainWindow init")
+        # Last config read from / queued for disk; writes are deferred
+        self._cfg_cache = None
+        self._cfg_dirty = False
+        # Restarted on every change so a burst of edits ends in one write
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.timeout.connect(self._flush_config)
+        logger.debug("MainWindow init")
 
         self._build_ui()
         self._load_config()
 
-        QShortcut(QKeySequence("Ctrl+G"), self, context=Qt.ApplicationShortcut).activated.connect(self.toggle_overlay)
-        print("[DEBUG] Ctrl+G shortcut for toggle set")
+        # Single app-wide Ctrl+G that only opens the overlay: it can't fire
+        # while this window is hidden, so Overlay.keyPressEvent handles
+        # Ctrl+G and Esc to close it
+        self._shortcut_toggle = QShortcut(QKeySequence("Ctrl+G"), self, context=Qt.ApplicationShortcut)
+        self._shortcut_toggle.activated.connect(self.toggle_overlay)
+        logger.debug("Ctrl+G shortcut for toggle set")
 
     def _build_ui(self):
         container = QWidget()
@@ -154,16 +303,21 @@ class MainWindow(QMainWindow):
         self.status = QLabel("Select a folder and set size, then Ctrl+G to preview")
         layout.addStretch()
         layout.addWidget(self.status)
-        print("[DEBUG] UI built")
+        logger.debug("UI built")
 
     def choose_folder(self):
         fld = QFileDialog.getExistingDirectory(self, "Select Save Folder")
         if fld:
             self.save_folder = fld
             self.folder_edit.setText(fld)
+            self._save_folder_ok = os.access(fld, os.W_OK)
+            self._shot_counter = last_shot_number(fld)
             self._save_config()
-            self.status.setText("Folder set! Now press Ctrl+G to preview")
-            print(f"[DEBUG] Folder chosen: {fld}")
+            if self._save_folder_ok:
+                self.status.setText("Folder set! Now press Ctrl+G to preview")
+            else:
+                self.status.setText("Folder is not writable, pick another")
+            logger.debug("Folder chosen: %s", fld)
 
     def _save_size(self, key):
         try:
@@ -174,58 +328,94 @@ class MainWindow(QMainWindow):
             else:
                 self.height = val
             self._save_config()
-            print(f"[DEBUG] Size changed {key}: {old} → ({self.width}, {self.height})")
+            logger.debug("Size changed %s: %s → (%s, %s)", key, old, self.width, self.height)
         except ValueError:
-            print("[DEBUG] Invalid size input, ignoring")
+            logger.debug("Invalid size input, ignoring")
 
     def _save_config(self):
         data = {"folder": self.save_folder, "width": self.width, "height": self.height}
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(data, f)
-        print("[DEBUG] Config saved")
+        if data == self._cfg_cache:
+            return
+        self._cfg_cache = data
+        self._cfg_dirty = True
+        self._save_timer.start(250)
+
+    def _flush_config(self):
+        self._save_timer.stop()
+        if not self._cfg_dirty:
+            return
+        if orjson is not None:
+            raw = orjson.dumps(self._cfg_cache)
+        else:
+            raw = json.dumps(self._cfg_cache).encode()
+        # write aside and rename, so a crash never leaves a half-written config
+        tmp = CONFIG_FILE + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, CONFIG_FILE)
+        except OSError as e:
+            # stay dirty so the next change or close retries the write
+            logger.warning("Failed to save config %s: %s", CONFIG_FILE, e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._cfg_dirty = False
+        logger.debug("Config saved")
 
     def _load_config(self):
         if not os.path.exists(CONFIG_FILE):
-            print("[DEBUG] No config file found")
+            logger.debug("No config file found")
             return
         with open(CONFIG_FILE, "r") as f:
             data = json.load(f)
+        self._cfg_cache = data
         fld = data.get("folder", "")
         if os.path.isdir(fld):
             self.save_folder = fld
             self.folder_edit.setText(fld)
-            print(f"[DEBUG] Loaded folder: {fld}")
+            self._save_folder_ok = os.access(fld, os.W_OK)
+            self._shot_counter = last_shot_number(fld)
+            logger.debug("Loaded folder: %s", fld)
         self.width = int(data.get("width", self.width))
         self.height = int(data.get("height", self.height))
         self.w_edit.setText(str(self.width))
         self.h_edit.setText(str(self.height))
-        print(f"[DEBUG] Loaded size: ({self.width}, {self.height})")
+        logger.debug("Loaded size: (%d, %d)", self.width, self.height)
 
     def toggle_overlay(self):
-        if self.overlay and self.overlay.isVisible():
-            print("[DEBUG] Toggling overlay OFF")
-            self.overlay.close()
-        else:
-            if not self.save_folder:
-                self.status.setText("Please select a folder first!")
-                print("[DEBUG] No folder selected, cannot open overlay")
-                return
-            print("[DEBUG] Toggling overlay ON")
-            self.hide()
-            self.overlay = Overlay(
-                self.width, self.height,
-                self.save_folder,
-                on_closed=self._overlay_closed
-            )
-
-    def _overlay_closed(self):
+        if not self._save_folder_ok:
+            self.status.setText("Please select a writable folder first!")
+            logger.debug("No writable folder selected, cannot open overlay")
+            return
+        logger.debug("Toggling overlay ON")
+        self.hide()
+        self.overlay = Overlay(
+            self.width, self.height,
+            self.save_folder,
+            self._shot_counter,
+            on_closed=self._overlay_closed
+        )
+
+    def closeEvent(self, event):
+        # don't lose an edit still waiting on the save timer, or a shot
+        # still being written by a SaveTask on the pool
+        self._flush_config()
+        QThreadPool.globalInstance().waitForDone()
+        super().closeEvent(event)
+
+    def _overlay_closed(self, counter):
+        self._shot_counter = counter
         self.show()
         self.status.setText("Preview off. Ctrl+G to preview again")
-        print("[DEBUG] Returned to main window")
+        logger.debug("Returned to main window")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="[%(levelname)s] %(message)s")
     app = QApplication(sys.argv)
     win = MainWindow()
     win.show()
-    print("[DEBUG] Application started")
+    logger.debug("Application started")
     sys.exit(app.exec_())